@@ -4,15 +4,27 @@ The Dongometer - FIXED VERSION
 Fenthouse lock support added
 """
 import os
+import bisect
+import gzip
 import json
+import math
 import sqlite3
+import signal
+import subprocess
+import sys
 import threading
 import time
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 from collections import deque
 
+try:
+    import orjson
+except ImportError:
+    # Optional: falls back to the stdlib encoder
+    orjson = None
+
 # Fenthouse auto-poster configuration
 FENTHOUSE_MESSAGES = [
     "🌿 THE FENTHOUSE LIVES 🌿 42069 CHAOS ACHIEVED",
@@ -27,104 +39,140 @@ MATRIX_HOMESERVER = os.environ.get('MATRIX_HOMESERVER', 'https://matrix.cclub.cs
 MATRIX_ACCESS_TOKEN = os.environ.get('MATRIX_ACCESS_TOKEN')
 FENTHOUSE_ROOM_ID = os.environ.get('FENTHOUSE_ROOM_ID', '!rfkqkxlyocxeqmrbxi:cclub.cs.wmich.edu')  # Internal room ID
 
+def dumps_json(data):
+    """Serialize a response body straight to UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
 DB_PATH = os.path.join(os.path.dirname(__file__), 'dongometer.db')
+DONGOMETER_FAST = os.environ.get('DONGOMETER_FAST') == '1'
+
+# Responses smaller than this aren't worth gzipping on the fly
+GZIP_MIN_SIZE = 1024
+
+# Matrix indexer MongoDB (inside doghouse container, mongo is at hostname 'mongo')
+MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://mongo:27017')
+# The same database for the queries that shell out to mongosh
+MONGOSH_URI = MONGO_URI.rstrip('/') + '/matrix_index'
 
 # Matrix indexer cache
-_indexer_cache = {'count': None, 'timestamp': 0, 'rooms': None}
+_indexer_cache = {'count': None, 'timestamp': 0, 'rooms': None, 'rooms_timestamp': 0}
 _metrics_cache = {'data': None, 'timestamp': 0}
 
-def get_indexer_metrics():
+# 'running' is set by start_cache_refresher(). The other keys are when each kind of
+# reader last read the caches: 'score' for the chaos score (every event and poll),
+# 'dashboard' for the rest of /api/metrics. While a kind of reader keeps coming the
+# refresher threads refill its caches, so requests serve what's cached instead of
+# querying MongoDB inline
+_refresher = {'running': False, 'score': 0, 'dashboard': 0}
+READER_IDLE_TIMEOUT = 60
+
+def readers_active(kind):
+    """Whether a reader of this kind has read the caches within READER_IDLE_TIMEOUT"""
+    return time.time() - _refresher[kind] < READER_IDLE_TIMEOUT
+
+def cache_is_fresh(timestamp, ttl, kind='dashboard'):
+    """Whether a cached value can be served without querying MongoDB inline"""
+    if time.time() - timestamp < ttl:
+        return True
+    # Past its TTL, but the refresher is already refilling it
+    return _refresher['running'] and readers_active(kind)
+
+def note_reader(*kinds):
+    """Record that a request read these kinds of caches (call after reading them)"""
+    now = time.time()
+    for kind in kinds:
+        _refresher[kind] = now
+
+_mongo = {'client': None}
+_mongo_lock = threading.Lock()
+
+def get_indexer_events():
+    """Get the indexer's events collection from a shared, pooled MongoClient
+
+    The recent-window counts expect an index on origin_server_ts. The indexer
+    owns the collection, so creating it is a deployment step (see README).
+    """
+    if _mongo['client'] is None:
+        with _mongo_lock:
+            if _mongo['client'] is None:
+                from pymongo import MongoClient
+                _mongo['client'] = MongoClient(
+                    MONGO_URI, minPoolSize=2, maxPoolSize=10, serverSelectionTimeoutMS=500
+                )
+    return _mongo['client'].matrix_index.events
+
+def get_indexer_metrics(force=False):
     """Get message counts from MongoDB indexer for last 5min/10min/hour"""
     global _metrics_cache
 
-    # Return cached if recent (5 seconds)
-    if _metrics_cache['data'] is not None:
-        if time.time() - _metrics_cache['timestamp'] < 5:
-            return _metrics_cache['data']
+    # Return cached if recent (5 seconds) - a failed query is cached as None too
+    if not force and cache_is_fresh(_metrics_cache['timestamp'], 5, 'score'):
+        return _metrics_cache['data']
 
     try:
-        import subprocess
-        import json
-
-        now = datetime.now()
-        five_min_ago = (now - timedelta(minutes=5)).timestamp() * 1000
-        ten_min_ago = (now - timedelta(minutes=10)).timestamp() * 1000
-        hour_ago = (now - timedelta(hours=1)).timestamp() * 1000
-
-        # Query MongoDB for recent events
-        query = f"""
-        var fiveMin = db.events.countDocuments({{"origin_server_ts": {{$gt: {int(five_min_ago)}}}}});
-        var tenMin = db.events.countDocuments({{"origin_server_ts": {{$gt: {int(ten_min_ago)}}}}});
-        var hour = db.events.countDocuments({{"origin_server_ts": {{$gt: {int(hour_ago)}}}}});
-        print(JSON.stringify({{fiveMin: fiveMin, tenMin: tenMin, hour: hour}}));
-        """
-
-        result = subprocess.run(
-            ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
-             '--eval', query],
-            capture_output=True, text=True, timeout=5
-        )
-
-        if result.returncode == 0:
-            # Parse the JSON output
-            lines = result.stdout.strip().split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith('{'):
-                    data = json.loads(line)
-                    _metrics_cache['data'] = data
-                    _metrics_cache['timestamp'] = time.time()
-                    return data
-        return None
+        now_ms = time.time() * 1000
+        five_min_ago = now_ms - 5 * 60 * 1000
+        ten_min_ago = now_ms - 10 * 60 * 1000
+        hour_ago = now_ms - 60 * 60 * 1000
+
+        # One pass over the last hour of the index, split into all three windows
+        pipeline = [
+            {'$match': {'origin_server_ts': {'$gt': int(hour_ago)}}},
+            {'$facet': {
+                'fiveMin': [{'$match': {'origin_server_ts': {'$gt': int(five_min_ago)}}}, {'$count': 'n'}],
+                'tenMin': [{'$match': {'origin_server_ts': {'$gt': int(ten_min_ago)}}}, {'$count': 'n'}],
+                'hour': [{'$count': 'n'}],
+            }},
+        ]
+        result = next(get_indexer_events().aggregate(pipeline), {})
+        # $count yields an empty list when nothing matched
+        data = {key: result[key][0]['n'] if result.get(key) else 0
+                for key in ('fiveMin', 'tenMin', 'hour')}
+        _metrics_cache['data'] = data
+        _metrics_cache['timestamp'] = time.time()
+        return data
     except Exception as e:
         print(f"Indexer metrics error: {e}")
+        # Every /api/event recomputes the score, so don't wait on a dead MongoDB each time
+        _metrics_cache['data'] = None
+        _metrics_cache['timestamp'] = time.time()
         return None
 
-def get_indexer_count():
+def get_indexer_count(force=False):
     """Get total message count from Matrix indexer MongoDB"""
     global _indexer_cache
 
     # Return cached value if recent
-    if _indexer_cache['count'] is not None:
-        if time.time() - _indexer_cache['timestamp'] < 60:
+    if _indexer_cache['count'] is not None and not force:
+        if cache_is_fresh(_indexer_cache['timestamp'], 60):
             return _indexer_cache['count']
 
     try:
-        import subprocess
-        # Try mongosh directly (inside doghouse container, mongo is at hostname 'mongo')
-        result = subprocess.run(
-            ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
-             '--eval', 'db.events.countDocuments()'],
-            capture_output=True, text=True, timeout=5
-        )
-
-        if result.returncode == 0:
-            count = int(result.stdout.strip())
-            _indexer_cache['count'] = count
-            _indexer_cache['timestamp'] = time.time()
-            return count
-        return None
+        # Collection metadata counter: O(1) instead of a full scan, and close enough for a 60s-cached tile
+        count = get_indexer_events().estimated_document_count()
+        _indexer_cache['count'] = count
+        _indexer_cache['timestamp'] = time.time()
+        return count
 
     except Exception:
         # MongoDB not available
         return None
 
-def get_indexer_rooms():
+def get_indexer_rooms(force=False):
     """Get room count from Matrix indexer MongoDB"""
     global _indexer_cache
 
     # Return cached value if recent
-    if _indexer_cache['rooms'] is not None:
-        if time.time() - _indexer_cache['timestamp'] < 60:
+    if _indexer_cache['rooms'] is not None and not force:
+        if cache_is_fresh(_indexer_cache['rooms_timestamp'], 60):
             return _indexer_cache['rooms']
 
     try:
-        import subprocess
         result = subprocess.run(
             ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
+             MONGOSH_URI,
              '--eval', 'db.events.distinct("room_id").length'],
             capture_output=True, text=True, timeout=5
         )
@@ -132,7 +180,7 @@ def get_indexer_rooms():
         if result.returncode == 0:
             rooms = int(result.stdout.strip())
             _indexer_cache['rooms'] = rooms
-            _indexer_cache['timestamp'] = time.time()
+            _indexer_cache['rooms_timestamp'] = time.time()
             return rooms
         return None
 
@@ -143,9 +191,6 @@ def get_indexer_rooms():
 def get_pizza_metrics():
     """Get pizza count from MongoDB indexer by searching message content"""
     try:
-        import subprocess
-        import json
-
         # Count messages containing 'pizza' or 🍕 in the last 24 hours
         day_ago = (datetime.now() - timedelta(hours=24)).timestamp() * 1000
 
@@ -165,7 +210,7 @@ def get_pizza_metrics():
 
         result = subprocess.run(
             ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
+             MONGOSH_URI,
              '--eval', query],
             capture_output=True, text=True, timeout=10
         )
@@ -182,29 +227,36 @@ def get_pizza_metrics():
         print(f"Pizza metrics error: {e}")
         return None
 
-_pizza_cache = {'count': None, 'timestamp': 0}
+_pizza_cache = {'count': None, 'timestamp': 0, 'failed': 0}
+
+def _refresh_count(cache, fetch):
+    """Run a count query and store its result in the cache (or when it failed)"""
+    count = fetch()
+    if count is not None:
+        cache['count'] = count
+        cache['timestamp'] = time.time()
+    else:
+        cache['failed'] = time.time()
+    return count
 
 def get_cached_pizza_count():
     """Get pizza count with 30-second caching"""
     global _pizza_cache
 
-    if _pizza_cache['count'] is not None:
-        if time.time() - _pizza_cache['timestamp'] < 30:
-            return _pizza_cache['count']
+    # A failed query is remembered for the TTL too, so a MongoDB outage doesn't
+    # put a mongosh call on every request
+    if _pizza_cache['count'] is not None or _pizza_cache['failed']:
+        if cache_is_fresh(max(_pizza_cache['timestamp'], _pizza_cache['failed']), 30, 'score'):
+            return _pizza_cache['count'] or 0
 
-    count = get_pizza_metrics()
+    count = _refresh_count(_pizza_cache, get_pizza_metrics)
     if count is not None:
-        _pizza_cache['count'] = count
-        _pizza_cache['timestamp'] = time.time()
         return count
     return _pizza_cache['count'] or 0
 
 def get_glizz_metrics():
     """Get glizz (hotdog) count from MongoDB indexer - tracks hotdog/glizzy culture"""
     try:
-        import subprocess
-        import json
-
         # Count messages containing hotdog-related terms in last 24 hours
         day_ago = (datetime.now() - timedelta(hours=24)).timestamp() * 1000
 
@@ -224,7 +276,7 @@ def get_glizz_metrics():
 
         result = subprocess.run(
             ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
+             MONGOSH_URI,
              '--eval', query],
             capture_output=True, text=True, timeout=10
         )
@@ -241,29 +293,25 @@ def get_glizz_metrics():
         print(f"Glizz metrics error: {e}")
         return None
 
-_glizz_cache = {'count': None, 'timestamp': 0}
+_glizz_cache = {'count': None, 'timestamp': 0, 'failed': 0}
 
 def get_cached_glizz_count():
     """Get glizz count with 30-second caching"""
     global _glizz_cache
 
-    if _glizz_cache['count'] is not None:
-        if time.time() - _glizz_cache['timestamp'] < 30:
-            return _glizz_cache['count']
+    # A failed query is remembered for the TTL too (see get_cached_pizza_count)
+    if _glizz_cache['count'] is not None or _glizz_cache['failed']:
+        if cache_is_fresh(max(_glizz_cache['timestamp'], _glizz_cache['failed']), 30):
+            return _glizz_cache['count'] or 0
 
-    count = get_glizz_metrics()
+    count = _refresh_count(_glizz_cache, get_glizz_metrics)
     if count is not None:
-        _glizz_cache['count'] = count
-        _glizz_cache['timestamp'] = time.time()
         return count
     return _glizz_cache['count'] or 0
 
 def get_dong_metrics():
     """Get dong count from MongoDB indexer - tracks CClub culture/energy"""
     try:
-        import subprocess
-        import json
-
         # Count messages containing 'dong' in last 24 hours
         day_ago = (datetime.now() - timedelta(hours=24)).timestamp() * 1000
 
@@ -283,7 +331,7 @@ def get_dong_metrics():
 
         result = subprocess.run(
             ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
+             MONGOSH_URI,
              '--eval', query],
             capture_output=True, text=True, timeout=10
         )
@@ -300,29 +348,25 @@ def get_dong_metrics():
         print(f"Dong metrics error: {e}")
         return None
 
-_dong_cache = {'count': None, 'timestamp': 0}
+_dong_cache = {'count': None, 'timestamp': 0, 'failed': 0}
 
 def get_cached_dong_count():
     """Get dong count with 30-second caching"""
     global _dong_cache
 
-    if _dong_cache['count'] is not None:
-        if time.time() - _dong_cache['timestamp'] < 30:
-            return _dong_cache['count']
+    # A failed query is remembered for the TTL too (see get_cached_pizza_count)
+    if _dong_cache['count'] is not None or _dong_cache['failed']:
+        if cache_is_fresh(max(_dong_cache['timestamp'], _dong_cache['failed']), 30):
+            return _dong_cache['count'] or 0
 
-    count = get_dong_metrics()
+    count = _refresh_count(_dong_cache, get_dong_metrics)
     if count is not None:
-        _dong_cache['count'] = count
-        _dong_cache['timestamp'] = time.time()
         return count
     return _dong_cache['count'] or 0
 
 def get_dong_analytics(all_time=False):
     """Get breakdown analytics for each dong variant (bar graph data)"""
     try:
-        import subprocess
-        import json
-
         day_ago = (datetime.now() - timedelta(hours=24)).timestamp() * 1000
 
         # Query for each variant individually
@@ -348,7 +392,7 @@ def get_dong_analytics(all_time=False):
 
             result = subprocess.run(
                 ['mongosh', '--quiet',
-                 'mongodb://mongo:27017/matrix_index',
+                 MONGOSH_URI,
                  '--eval', query],
                 capture_output=True, text=True, timeout=5
             )
@@ -366,7 +410,18 @@ def get_dong_analytics(all_time=False):
         print(f"Dong analytics error: {e}")
         return {}
 
-_dong_analytics_cache = {'24h': None, 'all_time': None, 'timestamp_24h': 0, 'timestamp_all': 0}
+_dong_analytics_cache = {'24h': None, 'all_time': None, 'timestamp_24h': 0, 'timestamp_all': 0,
+                         'failed_24h': 0, 'failed_all': 0}
+
+def _refresh_dong_analytics(all_time=False):
+    """Query dong analytics and store the result in the cache (or when it failed)"""
+    data = get_dong_analytics(all_time=all_time)
+    if data:
+        _dong_analytics_cache['all_time' if all_time else '24h'] = data
+        _dong_analytics_cache['timestamp_all' if all_time else 'timestamp_24h'] = time.time()
+    else:
+        _dong_analytics_cache['failed_all' if all_time else 'failed_24h'] = time.time()
+    return data
 
 def get_cached_dong_analytics(all_time=False):
     """Get dong analytics with 60-second caching"""
@@ -374,24 +429,21 @@ def get_cached_dong_analytics(all_time=False):
     
     cache_key = 'all_time' if all_time else '24h'
     time_key = 'timestamp_all' if all_time else 'timestamp_24h'
+    failed_key = 'failed_all' if all_time else 'failed_24h'
     
-    if _dong_analytics_cache[cache_key] is not None:
-        if time.time() - _dong_analytics_cache[time_key] < 60:
-            return _dong_analytics_cache[cache_key]
+    # A failed query is remembered for the TTL too (see get_cached_pizza_count)
+    if _dong_analytics_cache[cache_key] is not None or _dong_analytics_cache[failed_key]:
+        if cache_is_fresh(max(_dong_analytics_cache[time_key], _dong_analytics_cache[failed_key]), 60):
+            return _dong_analytics_cache[cache_key] or {}
     
-    data = get_dong_analytics(all_time=all_time)
+    data = _refresh_dong_analytics(all_time=all_time)
     if data:
-        _dong_analytics_cache[cache_key] = data
-        _dong_analytics_cache[time_key] = time.time()
         return data
     return _dong_analytics_cache[cache_key] or {}
 
 def get_favorite_word():
     """Find CClub's favorite word (most mentioned non-stop word across all rooms)"""
     try:
-        import subprocess
-        import json
-        
         # Query for top words across all CClub rooms
         stopWordsFull = ["the", "a", "to", "and", "of", "i", "is", "in", "you", "it", "for", "on", "or", "not", "are", "an", "as", "but", "can", "at", "me", "my", "by", "do", "we", "he", "if", "all", "be", "was", "has", "had", "did", "get", "use", "way", "its", "who", "now", "how", "why", "too", "very", "much", "many", "also", "here", "there", "where", "when", "what", "which", "their", "them", "they", "these", "those", "this", "that", "then", "than", "only", "other", "some", "more", "most", "such", "no", "each", "few", "one", "two", "three", "first", "next", "well", "own", "same", "so", "than", "she", "her", "his", "him", "our", "ours", "your", "yours", "hers", "theirs", "myself", "yourself", "himself", "herself", "itself", "ourselves", "yourselves", "themselves", "any", "both", "nor", "will", "would", "could", "should", "may", "might", "must", "shall", "dont", "wont", "cant", "shouldnt", "couldnt", "wouldnt", "wasnt", "werent", "arent", "isnt", "doesnt", "didnt", "hasnt", "havent", "hadnt", "thats", "whats", "wheres", "whens", "whos", "heres", "shes", "hes", "theres", "theyre", "youre", "im", "ive", "youve", "weve", "theyve", "id", "youd", "hed", "shed", "wed", "theyd", "doing", "done", "got", "gotten", "go", "goes", "going", "went", "come", "came", "comes", "coming", "see", "saw", "seen", "sees", "seeing", "knew", "known", "knows", "knowing", "thought", "thinks", "thinking", "looked", "looks", "looking", "made", "makes", "making", "wanted", "wants", "wanting", "gave", "given", "gives", "giving", "used", "uses", "using", "found", "finds", "finding", "told", "tells", "telling", "asked", "asks", "asking", "seemed", "seems", "seeming", "felt", "feels", "feeling", "became", "becomes", "becoming", "left", "leaves", "leaving", "called", "calls", "calling", "good", "great", "right", "old", "little", "big", "high", "different", "small", "large", "early", "young", "important", "public", "private", "able", "with", "like", "have", "about", "from", "up", "down", "out", "over", "under", "again", "further", "then", "once", "here", "there", "why", "how", "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than", "too", "very", "just", "now", "also", "back", "still", "even", "again", "already", "yet", "always", "never", "sometimes", "often", "usually", "really", "actually", "probably", "maybe", "perhaps", "though", "although", "while", "since", "until", "unless", "although", "despite", "however", "therefore", "thus", "otherwise", "instead", "meanwhile", "furthermore", "moreover", "nevertheless", "nonetheless", "anyway", "besides", "except", "regarding", "concerning", "according", "due", "regardless", "notwithstanding", "https", "http", "www", "com", "org", "net", "io", "dev", "cancellationtoken", "think", "know", "set", "scoob", "scooby"]
         
@@ -421,7 +473,7 @@ def get_favorite_word():
         
         result = subprocess.run(
             ['mongosh', '--quiet',
-             'mongodb://mongo:27017/matrix_index',
+             MONGOSH_URI,
              '--eval', query],
             capture_output=True, text=True, timeout=10
         )
@@ -440,34 +492,109 @@ def get_favorite_word():
 
 _favorite_word_cache = {'data': None, 'top_words': None, 'timestamp': 0}
 
+def _refresh_favorite_word():
+    """Query the favorite word and store a successful result in the cache"""
+    data, top_words = get_favorite_word()
+    if data:
+        _favorite_word_cache['data'] = data
+        _favorite_word_cache['top_words'] = top_words
+        _favorite_word_cache['timestamp'] = time.time()
+    return data, top_words
+
 def get_cached_favorite_word():
     """Get favorite word with 5-minute caching"""
     global _favorite_word_cache
     
     if _favorite_word_cache['data'] is not None:
-        if time.time() - _favorite_word_cache['timestamp'] < 300:
+        if cache_is_fresh(_favorite_word_cache['timestamp'], 300):
             return _favorite_word_cache['data'], _favorite_word_cache['top_words']
     
-    data, top_words = get_favorite_word()
+    data, top_words = _refresh_favorite_word()
     if data:
-        _favorite_word_cache['data'] = data
-        _favorite_word_cache['top_words'] = top_words
-        _favorite_word_cache['timestamp'] = time.time()
         return data, top_words
     return _favorite_word_cache['data'] or {'word': 'scoob', 'count': 2089}, _favorite_word_cache['top_words'] or []
 
+# (cache, timestamp key, TTL seconds, reader kind, refill function) kept warm by the
+# cache refresher while that kind of reader is active (see _refresher).
+# The quick pymongo queries get their own thread so they never wait behind mongosh
+_FAST_REFRESH_JOBS = [
+    (_metrics_cache, 'timestamp', 5, 'score', lambda: get_indexer_metrics(force=True)),
+    (_indexer_cache, 'timestamp', 60, 'dashboard', lambda: get_indexer_count(force=True)),
+]
+_SLOW_REFRESH_JOBS = [
+    (_indexer_cache, 'rooms_timestamp', 60, 'dashboard', lambda: get_indexer_rooms(force=True)),
+    (_pizza_cache, 'timestamp', 30, 'score', lambda: _refresh_count(_pizza_cache, get_pizza_metrics)),
+    (_glizz_cache, 'timestamp', 30, 'dashboard', lambda: _refresh_count(_glizz_cache, get_glizz_metrics)),
+    (_dong_cache, 'timestamp', 30, 'dashboard', lambda: _refresh_count(_dong_cache, get_dong_metrics)),
+    (_dong_analytics_cache, 'timestamp_24h', 60, 'dashboard', lambda: _refresh_dong_analytics(all_time=False)),
+    (_dong_analytics_cache, 'timestamp_all', 60, 'dashboard', lambda: _refresh_dong_analytics(all_time=True)),
+    (_favorite_word_cache, 'timestamp', 300, 'dashboard', _refresh_favorite_word),
+]
+
 # Leaderboard functions removed per user request
 
+# Bumped by record_events(). Cached responses and scores keep the generation they
+# were built from and go stale once it changes, even if the event landed mid-rebuild
+_events_generation = {'count': 0}
+
+# Serialized /api/metrics body as one (timestamp, generation, body, gzip) tuple;
+# always read and replaced whole so the parts stay consistent
+_metrics_response = {'entry': None}
+
 metrics = {
-    'chat_velocity': deque(maxlen=100),
-    'door_events': deque(maxlen=50),
+    'chat_velocity': deque(maxlen=100),  # time.time() of each message
+    'door_events': deque(maxlen=50),  # (time.time(), count) pairs
     'pizza_count': 0,  # Will be overwritten after init_db()
     'last_updated': None,
     'chaos_score': 0.0,
 }
 
+# Request handlers run on separate threads; guards the deques and counters above
+metrics_lock = threading.Lock()
+
+def expire_metrics(now_ts):
+    """Drop chat entries older than an hour and door entries older than 10 minutes (hold metrics_lock)"""
+    chat = metrics['chat_velocity']
+    while chat and chat[0] <= now_ts - 3600:
+        chat.popleft()
+    doors = metrics['door_events']
+    while doors and doors[0][0] <= now_ts - 600:
+        doors.popleft()
+
+def count_since(timestamps, cutoff):
+    """Count entries newer than cutoff in a deque of ascending timestamps (binary search)"""
+    return len(timestamps) - bisect.bisect_right(timestamps, cutoff)
+
+def sum_counts_since(events, cutoff):
+    """Sum the counts of (timestamp, count) entries newer than cutoff"""
+    # (cutoff, inf) sorts after every entry stamped at or before cutoff
+    start = bisect.bisect_right(events, (cutoff, math.inf))
+    return sum(events[i][1] for i in range(start, len(events)))
+
+def connect_db(**kwargs):
+    """Open a SQLite connection with WAL journaling and the per-connection tuning pragmas"""
+    conn = sqlite3.connect(DB_PATH, **kwargs)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # synchronous, temp_store and mmap_size are per-connection, so set them every time
+    # DONGOMETER_FAST=1 skips fsync entirely: an OS crash or power loss can lose the last
+    # few seconds of rollups (or corrupt the file), which is fine for chaos telemetry
+    conn.execute('PRAGMA synchronous=OFF' if DONGOMETER_FAST else 'PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
+_db_local = threading.local()
+
+def get_db():
+    """Get this thread's persistent SQLite connection (WAL, autocommit)"""
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = connect_db(isolation_level=None)
+        _db_local.conn = conn
+    return conn
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect_db()
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS events (
@@ -478,9 +605,106 @@ def init_db():
             details TEXT
         )
     ''')
+    # Same schema as app.py, so /api/history and /api/leaderboard read these rows
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hourly_stats (
+            hour DATETIME PRIMARY KEY,
+            message_count INTEGER DEFAULT 0,
+            door_opens INTEGER DEFAULT 0,
+            chaos_score REAL DEFAULT 0.0
+        )
+    ''')
     conn.commit()
     conn.close()
 
+# Pending per-hour rollups: epoch hour -> [message_count, door_opens, peak chaos_score]
+# Updated under metrics_lock, flushed to hourly_stats by the event writer
+_hourly = {}
+HOURLY_FLUSH_INTERVAL = 60
+
+def parse_events(events):
+    """Validate posted events into (type, value) pairs, raising ValueError on bad input"""
+    parsed = []
+    for data in events:
+        if not isinstance(data, dict):
+            raise ValueError(f"event must be an object, got {data!r}")
+        event_type = data.get('type')
+        value = data.get('value')
+        if value is None:
+            value = 1
+        elif not isinstance(value, (int, float)):
+            raise ValueError(f"bad value type {type(value).__name__} for {event_type} event")
+        else:
+            try:
+                finite = math.isfinite(value)
+            except OverflowError:
+                # JSON integers can be arbitrarily large (10**400 doesn't fit a float)
+                finite = False
+            if not finite:
+                raise ValueError(f"out-of-range value for {event_type} event")
+
+        if event_type == 'chat_message':
+            # value > 1 is a batch of messages (or a chaos boost); the deque keeps 100 anyway
+            value = max(0, min(int(value), 100))
+        elif event_type in ('door_open', 'door_close'):
+            value = max(0, min(int(value), 100000))  # Cap at 100k per request for safety
+        parsed.append((event_type, value))
+    return parsed
+
+def record_hourly(now_ts, event_type, value, score):
+    """Add a parsed event to its hour's pending rollup (hold metrics_lock)"""
+    hour = int(now_ts // 3600)
+    counts = _hourly.get(hour)
+    if counts is None:
+        counts = _hourly[hour] = [0, 0, 0.0]
+    if event_type == 'chat_message':
+        counts[0] += value
+    elif event_type == 'door_open':
+        counts[1] += value
+    if score > counts[2]:
+        counts[2] = score
+
+def flush_hourly():
+    """Upsert the pending hourly rollups into hourly_stats"""
+    with metrics_lock:
+        if not _hourly:
+            return
+        pending = list(_hourly.items())
+        _hourly.clear()
+
+    rows = [
+        (time.strftime('%Y-%m-%d %H:00:00', time.localtime(hour * 3600)), msgs, doors, score)
+        for hour, (msgs, doors, score) in pending
+    ]
+    conn = get_db()
+    try:
+        conn.execute('BEGIN')
+        conn.executemany('''
+            INSERT INTO hourly_stats (hour, message_count, door_opens, chaos_score)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(hour) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                door_opens = door_opens + excluded.door_opens,
+                chaos_score = MAX(chaos_score, excluded.chaos_score)
+        ''', rows)
+        conn.execute('COMMIT')
+    except Exception as e:
+        print(f"[Event Writer] Dropped {len(rows)} hourly rollups: {e}")
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+
+def event_writer_thread():
+    """Background daemon thread that flushes the hourly rollups every HOURLY_FLUSH_INTERVAL seconds"""
+    while True:
+        time.sleep(HOURLY_FLUSH_INTERVAL)
+        flush_hourly()
+
+def start_event_writer():
+    """Start the event writer daemon thread"""
+    thread = threading.Thread(target=event_writer_thread, daemon=True, name='event-writer')
+    thread.start()
+    return thread
+
 def post_to_fenthouse(message):
     """Post a message to the Fenthouse Matrix room"""
     try:
@@ -552,40 +776,164 @@ def start_fenthouse_poster():
         print("     Set MATRIX_ACCESS_TOKEN to enable automatic Fenthouse posts")
         return False
 
+FENTHOUSE_LOCK_PATH = '/tmp/dongometer_lock'
+_lock_cache = {'mtime': None, 'data': None, 'timestamp': 0}
+
+def read_fenthouse_lock():
+    """Parse the Fenthouse lock file into (lock_time, duration, status_msg), re-reading only when its mtime changes"""
+    # Stat the file at most once a second
+    if time.time() - _lock_cache['timestamp'] < 1:
+        return _lock_cache['data']
+    _lock_cache['timestamp'] = time.time()
+
+    try:
+        mtime = os.stat(FENTHOUSE_LOCK_PATH).st_mtime_ns
+    except FileNotFoundError:
+        _lock_cache['mtime'] = None
+        _lock_cache['data'] = None
+        return None
+
+    if mtime == _lock_cache['mtime']:
+        return _lock_cache['data']
+
+    data = None
+    with open(FENTHOUSE_LOCK_PATH, 'r') as f:
+        content = f.read().strip()
+    parts = content.split(',')
+    if len(parts) >= 2:
+        lock_time = int(parts[0].strip())
+        duration = int(parts[1].strip())
+        status_msg = parts[2].strip() if len(parts) >= 3 else '🌿 FENTHOUSE ACTIVE'
+        data = (lock_time, duration, status_msg)
+    _lock_cache['mtime'] = mtime
+    _lock_cache['data'] = data
+    return data
+
+def cache_refresher_thread(jobs):
+    """Background daemon thread that refills expired caches while requests are reading them"""
+    # Failed refills don't update the cache timestamp, so track attempts too
+    # to avoid hammering MongoDB every second while it's down
+    last_attempt = [0] * len(jobs)
+
+    while True:
+        for i, (cache, time_key, ttl, kind, refresh) in enumerate(jobs):
+            # Nobody reading this cache: let it expire instead of querying MongoDB for no one
+            if readers_active(kind) and time.time() - max(cache[time_key], last_attempt[i]) >= ttl:
+                last_attempt[i] = time.time()
+                try:
+                    refresh()
+                except Exception as e:
+                    print(f"[Cache Refresher] Refresh error: {e}")
+
+        # Short enough to keep the 5s indexer metrics cache warm
+        time.sleep(1)
+
+def start_cache_refresher():
+    """Start the cache refresher daemon threads so active requests never wait on MongoDB"""
+    threads = []
+    for name, jobs in (('cache-refresher-fast', _FAST_REFRESH_JOBS), ('cache-refresher-slow', _SLOW_REFRESH_JOBS)):
+        thread = threading.Thread(target=cache_refresher_thread, args=(jobs,), daemon=True, name=name)
+        thread.start()
+        threads.append(thread)
+    _refresher['running'] = True
+    print("🔄 Cache refresher threads started (checking every second while the dashboard is polled)")
+    return threads
+
 def get_fenthouse_status():
     """Check if Fenthouse lock is active and return status info"""
     try:
-        if os.path.exists('/tmp/dongometer_lock'):
-            with open('/tmp/dongometer_lock', 'r') as f:
-                content = f.read().strip()
-                parts = content.split(',')
-                if len(parts) >= 2:
-                    lock_time = int(parts[0].strip())
-                    duration = int(parts[1].strip())
-                    status_msg = parts[2].strip() if len(parts) >= 3 else '🌿 FENTHOUSE ACTIVE'
-                    remaining = (lock_time + duration) - int(time.time())
-                    if remaining > 0:
-                        hours = remaining // 3600
-                        mins = (remaining % 3600) // 60
-                        secs = remaining % 60
-                        return {
-                            'active': True,
-                            'status_message': status_msg,
-                            'countdown': {'hours': hours, 'minutes': mins, 'seconds': secs, 'total_seconds': remaining},
-                            'expires_at': lock_time + duration
-                        }
+        lock = read_fenthouse_lock()
+        if lock is not None:
+            lock_time, duration, status_msg = lock
+            remaining = (lock_time + duration) - int(time.time())
+            if remaining > 0:
+                hours = remaining // 3600
+                mins = (remaining % 3600) // 60
+                secs = remaining % 60
+                return {
+                    'active': True,
+                    'status_message': status_msg,
+                    'countdown': {'hours': hours, 'minutes': mins, 'seconds': secs, 'total_seconds': remaining},
+                    'expires_at': lock_time + duration
+                }
     except Exception as e:
         print(f"Fenthouse status error: {e}")
     return {'active': False, 'status_message': None, 'countdown': None, 'expires_at': None}
 
-def calculate_chaos_score():
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+def _load_template(path, fallback=None):
+    """Read a template once and return it pre-encoded, or the fallback (None = 404) if missing"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return fallback.encode() if fallback is not None else None
+
+# Static pages are read and encoded once at startup (restart to pick up edits)
+DASHBOARD_HTML = _load_template('/home/scoob/dongometer/templates/dashboard.html', '<h1>Dongometer</h1>')
+MANIFOLD_HTML = _load_template('/home/scoob/dongometer/templates/manifold.html', '<h1>Dong Manifold</h1>')
+MANIFOLD_3D_HTML = _load_template('/home/scoob/dongometer/templates/manifold_3d.html', '<h1>Dong Manifold 3D</h1>')
+FENTVIZ_HTML = _load_template(os.path.join(TEMPLATE_DIR, 'fenthouse_viz.html'))
+FENTVIZ_WEBGL_HTML = _load_template(os.path.join(TEMPLATE_DIR, 'fenthouse_viz_webgl.html'))
+FENTVIZ_GLITCH_HTML = _load_template(os.path.join(TEMPLATE_DIR, 'fenthouse_viz_glitch.html'))
+INDEXER_DASHBOARD_HTML = _load_template(os.path.join(TEMPLATE_DIR, 'indexer_dashboard.html'))
+INDEXER_COVERAGE_HTML = _load_template(os.path.join(TEMPLATE_DIR, 'indexer_coverage.html'))
+
+def _precompress(html):
+    """Gzip a preloaded template once at max compression (missing templates stay None)"""
+    return gzip.compress(html, 9) if html is not None else None
+
+DASHBOARD_HTML_GZ = _precompress(DASHBOARD_HTML)
+MANIFOLD_HTML_GZ = _precompress(MANIFOLD_HTML)
+MANIFOLD_3D_HTML_GZ = _precompress(MANIFOLD_3D_HTML)
+FENTVIZ_HTML_GZ = _precompress(FENTVIZ_HTML)
+FENTVIZ_WEBGL_HTML_GZ = _precompress(FENTVIZ_WEBGL_HTML)
+FENTVIZ_GLITCH_HTML_GZ = _precompress(FENTVIZ_GLITCH_HTML)
+INDEXER_DASHBOARD_HTML_GZ = _precompress(INDEXER_DASHBOARD_HTML)
+INDEXER_COVERAGE_HTML_GZ = _precompress(INDEXER_COVERAGE_HTML)
+
+# Chaos score ceiling (also what an active Fenthouse lock forces)
+CHAOS_MAX = 42069.0
+
+# Status for each chaos band: CHAOS_STATUSES[i] covers scores up to CHAOS_THRESHOLDS[i],
+# the last entry everything above 1000 and below 42069
+CHAOS_THRESHOLDS = (20, 40, 60, 80, 100, 200, 500, 1000)
+CHAOS_STATUSES = (
+    '😴 CALM - CClub sleeps',
+    '⚡ ACTIVE - Normal operations',
+    '🍕 CHAOTIC - Pizza\'s here',
+    '👿 DEMONIC - Hardin needs a grader',
+    '☠️ APOCALYPSE - Gigglesgate 2.0',
+    '🔥 TRUE APOCALYPSE - CClub is no more',
+    '🌌 COSMIC HORROR - Physics has left the building',
+    '💀 MULTIVERSE COLLAPSE - All timelines converge to pizza',
+    '☠️🍕 HEAT DEATH OF UNIVERSE - Entropy is pizza now 🍕☠️',
+)
+FENTHOUSE_STATUS = '🌿 FENTHOUSE - Folding in the infinite 🌿 (Chaos maxed at funny number)'
+
+# 'entry' is a (timestamp, generation, score) tuple, read and replaced as one value
+# so a concurrent update can't be seen halfway through
+_score_cache = {'entry': None}
+
+def calculate_chaos_score(fenthouse=None):
+    """Chaos score, reused for up to a second (until the next event is recorded)"""
+    generation = _events_generation['count']
+    entry = _score_cache['entry']
+    if entry is not None and entry[1] == generation and time.time() - entry[0] < 1:
+        return entry[2]
+
+    score = _calculate_chaos_score(fenthouse)
+    _score_cache['entry'] = (time.time(), generation, score)
+    return score
+
+def _calculate_chaos_score(fenthouse=None):
     score = 0.0
-    now = datetime.now()
 
     # Check for Fenthouse lock - IF ACTIVE, FORCE CHAOS TO 42069
-    fenthouse = get_fenthouse_status()
+    if fenthouse is None:
+        fenthouse = get_fenthouse_status()
     if fenthouse['active']:
-        return 42069.0
+        return CHAOS_MAX
 
     # APOCALYPSE MODE - ALL LIMITERS REMOVED
     # Try to get metrics from MongoDB indexer first
@@ -596,16 +944,17 @@ def calculate_chaos_score():
         recent_msgs = indexer_data.get('fiveMin', 0)
         recent_doors = indexer_data.get('tenMin', 0) // 2  # Estimate doors as half
     else:
-        # Fallback to in-memory deques
-        recent_msgs = sum(1 for t in metrics['chat_velocity']
-                         if now - t < timedelta(minutes=5))
-        recent_doors = sum(1 for t in metrics['door_events']
-                          if now - t < timedelta(minutes=10))
+        # Fallback to in-memory deques (epoch-second timestamps)
+        now_ts = time.time()
+        with metrics_lock:
+            expire_metrics(now_ts)
+            recent_msgs = count_since(metrics['chat_velocity'], now_ts - 300)
+            recent_doors = sum_counts_since(metrics['door_events'], now_ts - 600)
 
     score += recent_msgs * 2  # NO CAP
     score += recent_doors * 5  # NO CAP
 
-    hour = now.hour
+    hour = time.localtime().tm_hour
     if 0 <= hour < 6:
         score += 20
     elif 18 <= hour < 24:
@@ -615,194 +964,24 @@ def calculate_chaos_score():
     else:
         score += 5
 
+    # Already maxed out - no need to look at pizza
+    if score >= CHAOS_MAX:
+        return CHAOS_MAX
+
     # PIZZA SCALING UNLEASHED - use MongoDB as source of truth
     pizza_count = get_cached_pizza_count()
     if pizza_count > 0:
         # Logarithmic scaling: every 10x pizzas adds +50 chaos
-        import math
         pizza_bonus = min(pizza_count * 2, 10)  # Base +10
         if pizza_count > 10000:
             pizza_bonus += math.log10(pizza_count) * 50  # Scaling bonus
         score += pizza_bonus
 
-    # NO MAX CAP - CHAOS IS UNLIMITED
-    return score
-
-class DongometerHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass
-
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
-
-        if path == '/':
-            self.serve_dashboard()
-        elif path == '/manifold':
-            self.serve_manifold()
-        elif path == '/manifold3d':
-            self.serve_manifold_3d()
-        elif path == '/fentviz':
-            self.serve_fentviz()
-        elif path == '/fentviz-webgl':
-            self.serve_fentviz_webgl()
-        elif path == '/fentviz_glitch':
-            self.serve_fentviz_glitch()
-        elif path == '/indexer':
-            self.serve_indexer_dashboard()
-        elif path == '/api/metrics':
-            self.serve_metrics()
-        elif path == '/api/indexer-stats':
-            self.serve_indexer_stats()
-        elif path == '/coverage':
-            self.serve_coverage_fast()
-        elif path == '/api/indexer-coverage':
-            self.serve_indexer_coverage_fast()
-        elif path == '/api/movies':
-            self.serve_movies()
-        elif path == '/api/movie-stream':
-            self.serve_movie_stream()
-        elif path == '/api/stream':
-            self.serve_youtube_stream()
-        elif path == '/movie-player':
-            self.serve_movie_player()
-        else:
-            self.send_error(404)
-
-    def do_POST(self):
-        parsed = urlparse(self.path)
-        if parsed.path == '/api/event':
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length).decode('utf-8')
-            try:
-                data = json.loads(body)
-                self.handle_event(data)
-            except json.JSONDecodeError:
-                self.send_error(400)
-        else:
-            self.send_error(404)
-
-    def serve_dashboard(self):
-        html = open('/home/scoob/dongometer/templates/dashboard.html').read() if os.path.exists('/home/scoob/dongometer/templates/dashboard.html') else '<h1>Dongometer</h1>'
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html.encode())
-
-    def serve_manifold(self):
-        html = open('/home/scoob/dongometer/templates/manifold.html').read() if os.path.exists('/home/scoob/dongometer/templates/manifold.html') else '<h1>Dong Manifold</h1>'
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html.encode())
-    
-    def serve_manifold_3d(self):
-        html = open('/home/scoob/dongometer/templates/manifold_3d.html').read() if os.path.exists('/home/scoob/dongometer/templates/manifold_3d.html') else '<h1>Dong Manifold 3D</h1>'
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html.encode())
-
-    def _load_movies(self):
-        """Load movie database from JSON"""
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'movies.json'), 'r') as f:
-                data = json.load(f)
-                return data.get('movies', [])
-        except Exception as e:
-            print(f"Error loading movies: {e}")
-            return []
-
-    def serve_movies(self):
-        """Serve movie catalog"""
-        movies = self._load_movies()
-        self.send_json({'count': len(movies), 'movies': movies})
-
-    def serve_movie_stream(self):
-        """Stream movie from Archive.org (proxy or redirect based on params)"""
-        parsed = urlparse(self.path)
-        params = parse_qs(parsed.query)
-        movie_id = params.get('id', [''])[0]
-        redirect = params.get('redirect', ['true'])[0].lower() == 'true'
-        
-        movies = self._load_movies()
-        movie = next((m for m in movies if m['id'] == movie_id), None)
-        
-        if not movie:
-            self.send_json({'error': 'Movie not found'})
-            return
-        
-        if redirect:
-            # Redirect to Archive.org directly (most efficient)
-            self.send_response(302)
-            self.send_header('Location', movie['url'])
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-        else:
-            # Return movie metadata for client-side playback
-            self.send_json({
-                'id': movie['id'],
-                'title': movie['title'],
-                'stream_url': movie['url'],
-                'type': 'archive_org'
-            })
-
-    def serve_youtube_stream(self):
-        """Get YouTube direct stream URL - returns JSON to avoid blocking proxy"""
-        import subprocess
-        
-        parsed = urlparse(self.path)
-        params = parse_qs(parsed.query)
-        video_id = params.get('id', [''])[0]
-        redirect = params.get('redirect', ['false'])[0].lower() == 'true'
-        
-        if not video_id:
-            self.send_json({'error': 'No video ID provided'})
-            return
-        
-        try:
-            # Use yt-dlp to get direct video URL
-            yt_dlp_path = '/tmp/yt-dlp'
-            youtube_url = f'https://www.youtube.com/watch?v={video_id}'
-            
-            result = subprocess.run(
-                [yt_dlp_path, '-f', 'best[height<=720]', '--get-url', youtube_url],
-                capture_output=True, text=True, timeout=30
-            )
-            
-            if result.returncode != 0:
-                print(f"yt-dlp error: {result.stderr}")
-                self.send_json({'error': 'Failed to get video stream URL'})
-                return
-            
-            direct_url = result.stdout.strip().split('\n')[0]
-            if not direct_url:
-                self.send_json({'error': 'No video stream URL found'})
-                return
-            
-            if redirect:
-                # Non-blocking redirect to direct URL
-                self.send_response(302)
-                self.send_header('Location', direct_url)
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-            else:
-                # Return JSON with direct URL - frontend handles streaming
-                self.send_json({
-                    'video_id': video_id,
-                    'stream_url': direct_url,
-                    'type': 'youtube_direct'
-                })
-                    
-        except subprocess.TimeoutExpired:
-            self.send_json({'error': 'Timeout getting video URL'})
-        except Exception as e:
-            print(f"Streaming error: {e}")
-            self.send_json({'error': str(e)})
+    # Chaos is maxed at the funny number
+    return min(score, CHAOS_MAX)
 
-    def serve_movie_player(self):
-        """Serve a standalone movie player page"""
-        html = '''<!DOCTYPE html>
+# Standalone Fenthouse Cinema page served at /movie-player
+MOVIE_PLAYER_HTML = '''<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
@@ -981,57 +1160,217 @@ class DongometerHandler(BaseHTTPRequestHandler):
         loadMovies();
     </script>
 </body>
-</html>'''
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html.encode())
+</html>'''.encode()
+MOVIE_PLAYER_HTML_GZ = _precompress(MOVIE_PLAYER_HTML)
 
-    def serve_fentviz_webgl(self):
-        """Serve the WebGL inkbox-style fluid simulation visualizer"""
+class DongometerHandler(BaseHTTPRequestHandler):
+    # Keep-alive: dashboards re-use one connection for every poll. Every
+    # response must therefore carry a Content-Length.
+    protocol_version = 'HTTP/1.1'
+    # Drop idle keep-alive connections after this many seconds
+    timeout = 30
+    # Buffer writes so headers and body go out together (flushed per request)
+    wbufsize = 64 * 1024
+    # Set TCP_NODELAY so small JSON replies aren't held back by Nagle
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+
+        if path == '/':
+            self.serve_dashboard()
+        elif path == '/manifold':
+            self.serve_manifold()
+        elif path == '/manifold3d':
+            self.serve_manifold_3d()
+        elif path == '/fentviz':
+            self.serve_fentviz()
+        elif path == '/fentviz-webgl':
+            self.serve_fentviz_webgl()
+        elif path == '/fentviz_glitch':
+            self.serve_fentviz_glitch()
+        elif path == '/indexer':
+            self.serve_indexer_dashboard()
+        elif path == '/api/metrics':
+            self.serve_metrics()
+        elif path == '/api/indexer-stats':
+            self.serve_indexer_stats()
+        elif path == '/coverage':
+            self.serve_coverage_fast()
+        elif path == '/api/indexer-coverage':
+            self.serve_indexer_coverage_fast()
+        elif path == '/api/movies':
+            self.serve_movies()
+        elif path == '/api/movie-stream':
+            self.serve_movie_stream()
+        elif path == '/api/stream':
+            self.serve_youtube_stream()
+        elif path == '/movie-player':
+            self.serve_movie_player()
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        if parsed.path in ('/api/event', '/api/events'):
+            content_length = int(self.headers.get('Content-Length', 0))
+            # json.loads takes bytes directly; no separate decode pass
+            body = self.rfile.read(content_length)
+            try:
+                data = json.loads(body)
+                if parsed.path == '/api/event':
+                    self.handle_event(data)
+                else:
+                    self.handle_events(data)
+            except ValueError:
+                # JSONDecodeError, UnicodeDecodeError and json's integer digit limit
+                # are all ValueErrors
+                self.send_error(400)
+        else:
+            self.send_error(404)
+
+    def serve_dashboard(self):
+        self.send_body(DASHBOARD_HTML, 'text/html', gzipped=DASHBOARD_HTML_GZ)
+
+    def serve_manifold(self):
+        self.send_body(MANIFOLD_HTML, 'text/html', gzipped=MANIFOLD_HTML_GZ)
+    
+    def serve_manifold_3d(self):
+        self.send_body(MANIFOLD_3D_HTML, 'text/html', gzipped=MANIFOLD_3D_HTML_GZ)
+
+    def _load_movies(self):
+        """Load movie database from JSON"""
         try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/fenthouse_viz_webgl.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
+            with open(os.path.join(os.path.dirname(__file__), 'movies.json'), 'r') as f:
+                data = json.load(f)
+                return data.get('movies', [])
+        except Exception as e:
+            print(f"Error loading movies: {e}")
+            return []
+
+    def serve_movies(self):
+        """Serve movie catalog"""
+        movies = self._load_movies()
+        self.send_json({'count': len(movies), 'movies': movies})
+
+    def serve_movie_stream(self):
+        """Stream movie from Archive.org (proxy or redirect based on params)"""
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        movie_id = params.get('id', [''])[0]
+        redirect = params.get('redirect', ['true'])[0].lower() == 'true'
+        
+        movies = self._load_movies()
+        movie = next((m for m in movies if m['id'] == movie_id), None)
+        
+        if not movie:
+            self.send_json({'error': 'Movie not found'})
+            return
+        
+        if redirect:
+            # Redirect to Archive.org directly (most efficient)
+            self.send_response(302)
+            self.send_header('Location', movie['url'])
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Content-Length', '0')
             self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        else:
+            # Return movie metadata for client-side playback
+            self.send_json({
+                'id': movie['id'],
+                'title': movie['title'],
+                'stream_url': movie['url'],
+                'type': 'archive_org'
+            })
+
+    def serve_youtube_stream(self):
+        """Get YouTube direct stream URL - returns JSON to avoid blocking proxy"""
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        video_id = params.get('id', [''])[0]
+        redirect = params.get('redirect', ['false'])[0].lower() == 'true'
+        
+        if not video_id:
+            self.send_json({'error': 'No video ID provided'})
+            return
+        
+        try:
+            # Use yt-dlp to get direct video URL
+            yt_dlp_path = '/tmp/yt-dlp'
+            youtube_url = f'https://www.youtube.com/watch?v={video_id}'
+            
+            result = subprocess.run(
+                [yt_dlp_path, '-f', 'best[height<=720]', '--get-url', youtube_url],
+                capture_output=True, text=True, timeout=30
+            )
+            
+            if result.returncode != 0:
+                print(f"yt-dlp error: {result.stderr}")
+                self.send_json({'error': 'Failed to get video stream URL'})
+                return
+            
+            direct_url = result.stdout.strip().split('\n')[0]
+            if not direct_url:
+                self.send_json({'error': 'No video stream URL found'})
+                return
+            
+            if redirect:
+                # Non-blocking redirect to direct URL
+                self.send_response(302)
+                self.send_header('Location', direct_url)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            else:
+                # Return JSON with direct URL - frontend handles streaming
+                self.send_json({
+                    'video_id': video_id,
+                    'stream_url': direct_url,
+                    'type': 'youtube_direct'
+                })
+                    
+        except subprocess.TimeoutExpired:
+            self.send_json({'error': 'Timeout getting video URL'})
+        except Exception as e:
+            print(f"Streaming error: {e}")
+            self.send_json({'error': str(e)})
+
+    def serve_movie_player(self):
+        """Serve a standalone movie player page"""
+        self.send_body(MOVIE_PLAYER_HTML, 'text/html', gzipped=MOVIE_PLAYER_HTML_GZ)
+
+    def serve_fentviz_webgl(self):
+        """Serve the WebGL inkbox-style fluid simulation visualizer"""
+        self.send_template(FENTVIZ_WEBGL_HTML, FENTVIZ_WEBGL_HTML_GZ)
 
     def serve_fentviz(self):
         """Serve the Fenthouse psychedelic visualizer"""
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/fenthouse_viz.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        self.send_template(FENTVIZ_HTML, FENTVIZ_HTML_GZ)
 
     def serve_fentviz_glitch(self):
         """Serve the Fenthouse ULTIMATE visualizer with YouTube movies + WebGL shaders"""
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/fenthouse_viz_glitch.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        self.send_template(FENTVIZ_GLITCH_HTML, FENTVIZ_GLITCH_HTML_GZ)
 
     def serve_metrics(self):
-        score = calculate_chaos_score()
+        # Back-to-back polls within a second of each other share one serialized body
+        generation = _events_generation['count']
+        entry = _metrics_response['entry']
+        if entry is not None and entry[1] == generation and time.time() - entry[0] < 1:
+            note_reader('score', 'dashboard')
+            self.send_json_bytes(entry[2], gzipped=entry[3])
+            return
+
+        # Check for Fenthouse lock status (shared with the score calculation)
+        fenthouse = get_fenthouse_status()
+
+        score = calculate_chaos_score(fenthouse)
         metrics['chaos_score'] = score
         metrics['last_updated'] = datetime.now().isoformat()
 
-        now = datetime.now()
-
-        # Check for Fenthouse lock status
-        fenthouse = get_fenthouse_status()
         fenthouse_active = fenthouse['active']
         fenthouse_countdown = fenthouse['countdown']
         status = fenthouse['status_message'] if fenthouse_active else None
@@ -1043,39 +1382,24 @@ class DongometerHandler(BaseHTTPRequestHandler):
             chat_1h = indexer_data.get('hour', 0)
             door_10m = indexer_data.get('tenMin', 0) // 2  # Estimate
         else:
-            chat_5m = sum(1 for t in metrics['chat_velocity']
-                         if now - t < timedelta(minutes=5))
-            chat_1h = len(metrics['chat_velocity'])
-            door_10m = sum(1 for t in metrics['door_events']
-                          if now - t < timedelta(minutes=10))
+            now_ts = time.time()
+            with metrics_lock:
+                expire_metrics(now_ts)
+                chat_5m = count_since(metrics['chat_velocity'], now_ts - 300)
+                chat_1h = len(metrics['chat_velocity'])  # Only the last hour is kept
+                door_10m = sum_counts_since(metrics['door_events'], now_ts - 600)
 
         # Check for PIZZAPOCALYPSE (>10k pizzas breaks reality) - UNLIMITED
         pizza_count = get_cached_pizza_count()
         if pizza_count > 10000:
-            score = score * 2.0  # 100% chaos boost, NO CAP
+            score = min(score * 2.0, CHAOS_MAX)  # 100% chaos boost, still maxed at the funny number
 
         # Determine status based on UNLIMITED chaos score
         if status is None:
-            if score <= 20:
-                status = '😴 CALM - CClub sleeps'
-            elif score <= 40:
-                status = '⚡ ACTIVE - Normal operations'
-            elif score <= 60:
-                status = '🍕 CHAOTIC - Pizza\'s here'
-            elif score <= 80:
-                status = '👿 DEMONIC - Hardin needs a grader'
-            elif score <= 100:
-                status = '☠️ APOCALYPSE - Gigglesgate 2.0'
-            elif score <= 200:
-                status = '🔥 TRUE APOCALYPSE - CClub is no more'
-            elif score <= 500:
-                status = '🌌 COSMIC HORROR - Physics has left the building'
-            elif score <= 1000:
-                status = '💀 MULTIVERSE COLLAPSE - All timelines converge to pizza'
-            elif score < 42069:
-                status = '☠️🍕 HEAT DEATH OF UNIVERSE - Entropy is pizza now 🍕☠️'
+            if score < CHAOS_MAX:
+                status = CHAOS_STATUSES[bisect.bisect_left(CHAOS_THRESHOLDS, score)]
             else:
-                status = '🌿 FENTHOUSE - Folding in the infinite 🌿 (Chaos maxed at funny number)'
+                status = FENTHOUSE_STATUS
 
         # Get Matrix indexer count if available
         indexer_count = get_indexer_count()
@@ -1106,56 +1430,78 @@ class DongometerHandler(BaseHTTPRequestHandler):
             'fenthouse_active': fenthouse_active,
             'fenthouse_countdown': fenthouse_countdown
         }
-        self.send_json(data)
+        body = dumps_json(data)
+        gzipped = gzip.compress(body, 6)
+        _metrics_response['entry'] = (time.time(), generation, body, gzipped)
+        note_reader('score', 'dashboard')
+        self.send_json_bytes(body, gzipped=gzipped)
 
     def handle_event(self, data):
-        event_type = data.get('type')
-        value = data.get('value', 1)
+        try:
+            events = parse_events([data])
+        except ValueError:
+            self.send_error(400)
+            return
 
-        now = datetime.now()
+        score = self.record_events(events)
 
-        if event_type == 'chat_message':
-            metrics['chat_velocity'].append(now)
-        elif event_type in ('door_open', 'door_close'):
-            # Honor the value parameter for mass door events
-            for _ in range(min(value, 100000)):  # Cap at 100k per request for safety
-                metrics['door_events'].append(now)
-        elif event_type == 'pizza':
-            metrics['pizza_count'] += value
-        elif event_type == 'reset_pizza':
-            metrics['pizza_count'] = 0
-
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO events (metric_type, value, details) VALUES (?, ?, ?)',
-            (event_type, value, data.get('details', ''))
-        )
-        conn.commit()
-        conn.close()
+        # Fixed-shape reply on the hottest POST path: format it directly (the score is a finite float)
+        self.send_json_bytes(b'{"success":true,"chaos_score":%r}' % score)
+
+    def handle_events(self, data):
+        """Record a batch of events posted as {"events": [...]} in one request"""
+        events = data.get('events') if isinstance(data, dict) else None
+        try:
+            if not isinstance(events, list):
+                raise ValueError("events must be a list")
+            # Reject the whole batch before any of it is applied
+            events = parse_events(events)
+        except ValueError:
+            self.send_error(400)
+            return
 
-        self.send_json({'success': True, 'chaos_score': calculate_chaos_score()})
+        score = self.record_events(events)
+        self.send_json_bytes(b'{"success":true,"count":%d,"chaos_score":%r}' % (len(events), score))
+
+    def record_events(self, events):
+        """Apply parse_events() output to the in-memory metrics and hourly rollup, returning the new chaos score"""
+        with metrics_lock:
+            # Read under the lock so concurrent posts append in timestamp order (bisect relies on it)
+            now = time.time()
+            expire_metrics(now)
+            for event_type, value in events:
+                if event_type == 'chat_message':
+                    metrics['chat_velocity'].extend([now] * value)
+                elif event_type in ('door_open', 'door_close'):
+                    # Honor the value parameter for mass door events as one (time, count) entry
+                    metrics['door_events'].append((now, value))
+                elif event_type == 'pizza':
+                    metrics['pizza_count'] += value
+                elif event_type == 'reset_pizza':
+                    metrics['pizza_count'] = 0
+            # New events must show up on the next poll
+            _events_generation['count'] += 1
+
+        score = calculate_chaos_score()
+
+        # Rolled up per hour and persisted by the event writer thread
+        with metrics_lock:
+            for event_type, value in events:
+                record_hourly(now, event_type, value, score)
+
+        # The score read the pizza and indexer caches
+        note_reader('score')
+        return score
 
     def serve_indexer_dashboard(self):
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/indexer_dashboard.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        self.send_template(INDEXER_DASHBOARD_HTML, INDEXER_DASHBOARD_HTML_GZ)
     
     def serve_indexer_stats(self):
         """Serve indexer statistics with anonymized channel names"""
         try:
-            import subprocess
-            import json
-            
             # Get total messages
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', 
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', 
                  'print(db.events.estimatedDocumentCount())'],
                 capture_output=True, text=True, timeout=10
             )
@@ -1191,7 +1537,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
             print(JSON.stringify(rooms));
             '''
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', query],
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', query],
                 capture_output=True, text=True, timeout=30
             )
             room_counts = json.loads(result.stdout.strip().split('\n')[-1]) if result.returncode == 0 else []
@@ -1206,7 +1552,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
             print(new Date(timestamp).toISOString().split('T')[0]);
             '''
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', query],
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', query],
                 capture_output=True, text=True, timeout=10
             )
             first_date = result.stdout.strip().split('\n')[-1] if result.returncode == 0 else 'Unknown'
@@ -1232,7 +1578,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
             '''
             query = js_code
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', query],
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', query],
                 capture_output=True, text=True, timeout=30
             )
             timeline = json.loads(result.stdout.strip().split('\n')[-1]) if result.returncode == 0 else []
@@ -1254,22 +1600,11 @@ class DongometerHandler(BaseHTTPRequestHandler):
     
     def serve_coverage(self):
         """Serve the coverage visualization HTML page"""
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/indexer_coverage.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        self.send_template(INDEXER_COVERAGE_HTML, INDEXER_COVERAGE_HTML_GZ)
 
     def serve_indexer_coverage(self):
         """Serve timeline coverage data for top 10 rooms in 7-day buckets"""
         try:
-            import subprocess
-            import json
-
             # Get top 10 rooms by event count with first/last event timestamps
             query = '''
             var pipeline = [
@@ -1300,7 +1635,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
             print(JSON.stringify(rooms));
             '''
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', query],
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', query],
                 capture_output=True, text=True, timeout=30
             )
 
@@ -1337,7 +1672,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
                     print(JSON.stringify({{start: {int(current)}, end: {int(bucket_end)}, count: count, has_data: count > 0}}));
                     '''
                     bucket_result = subprocess.run(
-                        ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', bucket_query],
+                        ['mongosh', '--quiet', MONGOSH_URI, '--eval', bucket_query],
                         capture_output=True, text=True, timeout=10
                     )
 
@@ -1368,22 +1703,11 @@ class DongometerHandler(BaseHTTPRequestHandler):
 
     def serve_coverage_fast(self):
         """Serve coverage HTML - fast version"""
-        try:
-            with open(os.path.join(os.path.dirname(__file__), 'templates/indexer_coverage.html'), 'r') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/html')
-            self.end_headers()
-            self.wfile.write(content.encode())
-        except FileNotFoundError:
-            self.send_error(404)
+        self.send_template(INDEXER_COVERAGE_HTML, INDEXER_COVERAGE_HTML_GZ)
 
     def serve_indexer_coverage_fast(self):
         """FAST coverage using single aggregation with 30-day buckets instead of 7-day"""
         try:
-            import subprocess
-            import json
-            
             # Single efficient query using MongoDB date bucketing
             query = '''
             var DAY_MS = 30 * 24 * 60 * 60 * 1000; // 30-day buckets for speed
@@ -1438,7 +1762,7 @@ class DongometerHandler(BaseHTTPRequestHandler):
             '''
             
             result = subprocess.run(
-                ['mongosh', '--quiet', 'mongodb://mongo:27017/matrix_index', '--eval', query],
+                ['mongosh', '--quiet', MONGOSH_URI, '--eval', query],
                 capture_output=True, text=True, timeout=60
             )
             
@@ -1456,25 +1780,66 @@ class DongometerHandler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_json({'error': str(e), 'rooms': []})
 
+    def send_template(self, html, gzipped=None):
+        """Send a template loaded at startup, or 404 if it was missing"""
+        if html is None:
+            self.send_error(404)
+        else:
+            self.send_body(html, 'text/html', gzipped=gzipped)
+
     def send_json(self, data):
+        self.send_json_bytes(dumps_json(data))
+
+    def send_json_bytes(self, body, gzipped=None):
+        self.send_body(body, 'application/json', gzipped=gzipped, cors=True)
+
+    def send_body(self, body, content_type, gzipped=None, cors=False):
+        """Send a 200 response, gzip-encoded when the client accepts it"""
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            if gzipped is None and len(body) >= GZIP_MIN_SIZE:
+                gzipped = gzip.compress(body, 6)
+        else:
+            gzipped = None
+
         self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Type', content_type)
+        if cors:
+            self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped is not None and len(gzipped) < len(body):
+            body = gzipped
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
 
 if __name__ == '__main__':
     init_db()
+
+    # Persist the hourly rollups off the request path
+    start_event_writer()
+
+    # dongometerctl and systemd stop us with SIGTERM; turn it into SystemExit
+    # so the final flush below still runs
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     # Start Fenthouse auto-poster daemon thread
     start_fenthouse_poster()
+
+    # Keep the slow MongoDB-backed caches warm in the background while they're being read
+    start_cache_refresher()
     
     # Allow socket reuse to avoid "Address already in use" errors
-    HTTPServer.allow_reuse_address = True
+    ThreadingHTTPServer.allow_reuse_address = True
     
-    server = HTTPServer(('0.0.0.0', 5000), DongometerHandler)
+    # One thread per connection so keep-alive clients don't block each other
+    server = ThreadingHTTPServer(('0.0.0.0', 5000), DongometerHandler)
     print("🍆 The Dongometer is live on http://localhost:5000")
     print("🍕 Pizza count now uses MongoDB (dynamic, no more crazy multipliers)")
     print("📊 Indexer dashboard at http://localhost:5000/indexer")
     print("🎬 Fenthouse Cinema at http://localhost:5000/fentviz")
-    server.serve_forever()
\ No newline at end of file
+    try:
+        server.serve_forever()
+    finally:
+        # Don't lose up to HOURLY_FLUSH_INTERVAL of rollups on restart
+        flush_hourly()
\ No newline at end of file
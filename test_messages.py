@@ -1,21 +1,30 @@
 #!/usr/bin/env python3
 """Test message counting for Dongometer"""
+import http.client
 import urllib.request
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+NUM_MESSAGES = 1000
+NUM_WORKERS = 32
+
+# One keep-alive connection per worker thread
+_local = threading.local()
 
 def send_event(event_type, value=1, details=""):
     data = json.dumps({"type": event_type, "value": value, "details": details}).encode()
-    req = urllib.request.Request(
-        'http://localhost:5000/api/event',
-        data=data,
-        headers={'Content-Type': 'application/json'}
-    )
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = http.client.HTTPConnection('localhost', 5000, timeout=2)
     try:
-        with urllib.request.urlopen(req, timeout=2) as resp:
-            return json.loads(resp.read().decode())
+        conn.request('POST', '/api/event', body=data, headers={'Content-Type': 'application/json'})
+        return json.loads(conn.getresponse().read())
     except Exception as e:
         print(f"Error: {e}")
+        conn.close()
+        _local.conn = None
         return None
 
 def get_metrics():
@@ -36,17 +45,18 @@ else:
     print("Dongometer not running! Start it first: python3 simple_app.py")
     exit(1)
 
-# Simulate 5 messages
-print("\nSending 5 chat messages...")
-for i in range(5):
-    result = send_event("chat_message", 1, f"Test message {i+1}")
-    print(f"  Message {i+1}: chaos={result.get('chaos_score') if result else 'error'}")
-    time.sleep(0.1)
+# Simulate a burst of messages from concurrent senders
+print(f"\nSending {NUM_MESSAGES} chat messages from {NUM_WORKERS} threads...")
+start = time.time()
+with ThreadPoolExecutor(max_workers=NUM_WORKERS) as ex:
+    results = list(ex.map(lambda i: send_event("chat_message", 1, f"Test message {i+1}"), range(NUM_MESSAGES)))
+elapsed = time.time() - start
+ok = sum(1 for r in results if r)
+print(f"  {ok}/{NUM_MESSAGES} succeeded in {elapsed:.2f}s ({NUM_MESSAGES / elapsed:.0f} req/s)")
 
 # Check result
-time.sleep(0.5)
 m = get_metrics()
-print(f"\nAfter 5 messages: messages(5m)={m['chat_velocity_5min']}, chaos={m['chaos_score']}")
+print(f"\nAfter {NUM_MESSAGES} messages: messages(5m)={m['chat_velocity_5min']}, chaos={m['chaos_score']}")
 print(f"Status: {m['status']}")
 
 print("\n" + "="*50)
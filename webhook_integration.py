@@ -3,96 +3,221 @@
 Dongometer Webhook Integration
 Called by Matrix bot when keywords detected
 """
-import requests
+import json
+import logging
+import queue
 import re
+import threading
+import time
 from datetime import datetime
 
-DONGOMETER_URL = "http://localhost:5000/api/event"
-
-# Keyword patterns
-PIZZA_PATTERNS = [
-    r'\bpizza\b',
-    r'\b🍕\b',
-    r'pizzas',
-    r'pizzatime',
-]
-
-DOOR_PATTERNS = [
-    r'\bdoor\s+open\b',
-    r'\bdoor\s+opened\b',
-    r'\bdoor\s+unlock\b',
-    r'🚪',
-]
-
-CHAOS_PATTERNS = [
-    r'\bchaos\b',
-    r'\bdong\b',
-    r'\bgigglesgate\b',
-    r'\bapocalyptic\b',
-    r'\bhardin\s+needs',
-]
+DONGOMETER_BULK_URL = "http://localhost:5000/api/events"
 
-def send_event(event_type, value=1, details=""):
-    """Send event to Dongometer"""
+class RateLimitFilter(logging.Filter):
+    """Let at most one record through per interval so an outage can't flood the log"""
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self.last = 0.0
+
+    def filter(self, record):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
+
+log = logging.getLogger("dongometer")
+log.addFilter(RateLimitFilter())
+
+# Shared session: keeps the connection to Dongometer alive between events
+_session = {'session': None}
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Keyword patterns: one compiled alternation per category, so each
+# category is a single pass over the message
+PIZZA_RE = re.compile(
+    r'\bpizza\b|pizza(?:s|time)'
+    r'|🍕'  # emoji aren't word characters, so no \b around it
+)
+
+DOOR_RE = re.compile(
+    r'\bdoor\s+(?:open(?:ed)?|unlock)\b'
+    r'|🚪'
+)
+
+CHAOS_RE = re.compile(
+    r'\b(?:chaos|dong|gigglesgate|apocalyptic)\b'
+    r'|\bhardin\s+needs'
+)
+
+# Substrings every match must contain. Most messages have none of them,
+# and a plain `in` check is much cheaper than entering the regex engine
+_PIZZA_TOKENS = ('pizza', '🍕')
+_DOOR_TOKENS = ('door', '🚪')
+_CHAOS_TOKENS = ('chaos', 'dong', 'gigglesgate', 'apocalyptic', 'hardin')
+
+# Event dicts waiting for the sender thread, posted in batches to /api/events
+_event_queue = queue.Queue(maxsize=10000)
+
+def get_session():
+    """Get the shared requests session, importing requests on first use"""
+    if _session['session'] is None:
+        # Imported lazily: requests pulls in urllib3 and friends, which callers
+        # that never send anything shouldn't pay for
+        import requests
+        session = requests.Session()
+        session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        _session['session'] = session
+    return _session['session']
+
+def post_events(events):
+    """POST several events to Dongometer in one request (blocking)"""
     try:
-        resp = requests.post(
-            DONGOMETER_URL,
-            json={"type": event_type, "value": value, "details": details},
+        resp = get_session().post(
+            DONGOMETER_BULK_URL,
+            data=json.dumps({"events": events}, separators=(",", ":")).encode(),
+            headers=_JSON_HEADERS,
             timeout=2
         )
         return resp.json()
     except Exception as e:
-        print(f"[Dongometer] Failed to send event: {e}")
+        log.warning("[Dongometer] Failed to send %d events: %s", len(events), e)
         return None
 
+def event_sender_thread():
+    """Background daemon thread that posts queued events in batches (up to 100 events or 100ms)"""
+    while True:
+        batch = [_event_queue.get()]
+        deadline = time.time() + 0.1
+        while len(batch) < 100:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_event_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            post_events(batch)
+        except Exception as e:
+            # Never let one bad batch kill the only sender thread
+            log.warning("[Dongometer] Dropped %d events: %s", len(batch), e)
+        finally:
+            for _ in batch:
+                _event_queue.task_done()
+
+def send_event(event_type, value=1, details=""):
+    """Queue an event for Dongometer (returns immediately)"""
+    start_threads()
+    try:
+        _event_queue.put_nowait({"type": event_type, "value": value, "details": details})
+    except queue.Full:
+        log.warning("[Dongometer] Queue full, dropped %s event", event_type)
+
+# Chat messages are only counted here and sent as one chat_message event per second
+# (a chaos boost adds CHAOS_BOOST on top of the message itself)
+CHAOS_BOOST = 2
+_chat_count = {'count': 0, 'boosts': 0}
+_chat_lock = threading.Lock()
+
+def flush_chat_count():
+    """Queue the chat messages counted since the last flush as a single event"""
+    with _chat_lock:
+        count = _chat_count['count']
+        boosts = _chat_count['boosts']
+        _chat_count['count'] = 0
+        _chat_count['boosts'] = 0
+    if count:
+        messages = count - boosts * CHAOS_BOOST
+        send_event("chat_message", count, f"{messages} chat message(s), {boosts} chaos boost(s)")
+
+def chat_flush_thread():
+    """Background daemon thread that flushes the chat message count every second"""
+    while True:
+        time.sleep(1)
+        flush_chat_count()
+
+# The background threads start with the first event, so importing this module is free
+_threads = {'started': False}
+_threads_lock = threading.Lock()
+
+def start_threads():
+    """Start the sender and chat flush daemon threads (once)"""
+    if _threads['started']:
+        return
+    with _threads_lock:
+        if not _threads['started']:
+            threading.Thread(target=event_sender_thread, daemon=True, name='dongometer-sender').start()
+            threading.Thread(target=chat_flush_thread, daemon=True, name='dongometer-chat-flush').start()
+            _threads['started'] = True
+
 def process_matrix_message(sender, message, room="#donghouse"):
     """
     Process a Matrix message and update Dongometer if keywords found.
     Call this from your Matrix bot's message handler.
     """
+    # Empty messages and bot commands don't count toward anything. Short
+    # messages still do: a lone 🍕 or 🚪 is a trigger
+    if not message or message[0] in '!/':
+        return []
+
     message_lower = message.lower()
     events_triggered = []
     
-    # Check for pizza
-    for pattern in PIZZA_PATTERNS:
-        if re.search(pattern, message_lower):
-            # Count occurrences
-            count = len(re.findall(pattern, message_lower))
-            result = send_event("pizza", count, f"{sender} mentioned pizza in {room}")
-            events_triggered.append(f"pizza+{count}")
-            break
+    # Check for pizza - counting the matches doubles as the search
+    if any(t in message_lower for t in _PIZZA_TOKENS):
+        count = sum(1 for _ in PIZZA_RE.finditer(message_lower))
+    else:
+        count = 0
+    if count:
+        send_event("pizza", count, f"{sender} mentioned pizza in {room}")
+        events_triggered.append(f"pizza+{count}")
     
     # Check for door events
-    for pattern in DOOR_PATTERNS:
-        if re.search(pattern, message_lower):
-            result = send_event("door_open", 1, f"{sender}: {message[:50]}")
-            events_triggered.append("door")
-            break
-    
-    # Check for chaos indicators (just log chat velocity)
-    send_event("chat_message", 1, f"{sender} in {room}")
+    if any(t in message_lower for t in _DOOR_TOKENS) and DOOR_RE.search(message_lower):
+        send_event("door_open", 1, f"{sender}: {message[:50]}")
+        events_triggered.append("door")
     
     # Boost chaos for certain keywords
-    for pattern in CHAOS_PATTERNS:
-        if re.search(pattern, message_lower):
-            # Extra chaos point
-            send_event("chat_message", 2, f"CHAOS BOOST: {sender} said {pattern}")
-            events_triggered.append("chaos_boost")
-            break
+    boosted = any(t in message_lower for t in _CHAOS_TOKENS) and CHAOS_RE.search(message_lower) is not None
+    if boosted:
+        events_triggered.append("chaos_boost")
+
+    # Log chat velocity, with any boost folded into the same count
+    start_threads()
+    with _chat_lock:
+        _chat_count['count'] += 1
+        if boosted:
+            _chat_count['count'] += CHAOS_BOOST
+            _chat_count['boosts'] += 1
     
     return events_triggered
 
+# Door sensor details only need second resolution, so format each second once
+_timestamp_cache = {'second': None, 'text': ''}
+
+def _now_iso():
+    """Local time as an ISO-8601 string, reformatted at most once per second"""
+    second = int(time.time())
+    if second != _timestamp_cache['second']:
+        _timestamp_cache['text'] = datetime.fromtimestamp(second).isoformat()
+        _timestamp_cache['second'] = second
+    return _timestamp_cache['text']
+
 def record_door_sensor(event_type="open", source="sensor"):
-    """Called by door sensor/webhook"""
-    return send_event(
+    """Called by door sensor/webhook (queued; fire-and-forget)"""
+    send_event(
         f"door_{event_type}", 
         1, 
-        f"Door {event_type} via {source} at {datetime.now().isoformat()}"
+        f"Door {event_type} via {source} at {_now_iso()}"
     )
 
 def record_pizza_arrival(count=1, topping="unknown", source="manual"):
-    """Record pizza arrival"""
-    return send_event(
+    """Record pizza arrival (queued; fire-and-forget)"""
+    send_event(
         "pizza", 
         count, 
         f"{count} pizza(s) - {topping} ({source})"
@@ -114,3 +239,7 @@ if __name__ == "__main__":
     print("\nTesting chaos detection...")
     result = process_matrix_message("clawdad", "this is total chaos right now")
     print(f"Triggered: {result}")
+    
+    # Wait for the sender thread to post everything before exiting
+    flush_chat_count()
+    _event_queue.join()